@@ -1,39 +1,99 @@
 import asyncio
+import os
 import shutil
 import uuid
 from pathlib import Path
 
-import aiofiles
 import aiohttp
 
 from astrbot.api import logger
 
 from .config import PluginConfig
+from .ytdlp import YTDLP_AVAILABLE, ytdlp
 
 
 class Downloader:
     """下载器"""
 
+    CHUNK_SIZE = 64 * 1024
+    """流式下载时每次读取的字节数"""
+
+    READ_BUFSIZE = 10 * 1024 * 1024
+    """响应读缓冲区大小，避免高速 CDN 下出现 Chunk too big"""
+
+    MEMORY_LIMIT = 50 * 1024 * 1024
+    """不超过该大小的歌曲先读入内存，再一次性写盘"""
+
+    QUEUE_SIZE = 64
+    """边下边写时，读取与写盘之间最多积压的块数"""
+
+    WRITE_BATCH = 32
+    """写线程单次最多合并写入的块数"""
+
+    RANGE_THRESHOLD = 2 * 1024 * 1024
+    """超过该大小且服务器支持 Range 时，分段并发下载"""
+
+    RANGE_PARTS = 4
+    """分段下载的并发连接数"""
+
+    RANGE_FLUSH_SIZE = 1024 * 1024
+    """分段下载时每积累多少字节写一次盘"""
+
+    TRANSCODE_RW_TIMEOUT = 15
+    """ffmpeg 直连转码时单次网络读写的超时（秒）"""
+
+    TRANSCODE_TIMEOUT = 300
+    """ffmpeg 直连转码的总超时（秒）"""
+
     def __init__(self, config: PluginConfig):
         self.cfg = config
         self.songs_dir = self.cfg.songs_dir
-        self.session = aiohttp.ClientSession(proxy=self.cfg.http_proxy)
-
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20,
+                use_dns_cache=True,
+                ttl_dns_cache=3600,
+                keepalive_timeout=75,
+            ),
+            timeout=aiohttp.ClientTimeout(total=None, connect=15, sock_read=60),
+            proxy=self.cfg.http_proxy,
+            read_bufsize=self.READ_BUFSIZE,
+        )
+        self._cleanup_task: asyncio.Task | None = None
 
     async def initialize(self):
         if self.cfg.clear_cache:
             self._ensure_cache_dir()
+        await ytdlp.start()
 
     async def close(self):
         await self.session.close()
+        await ytdlp.close()
 
     def _ensure_cache_dir(self) -> None:
-        """重建缓存目录：存在则清空，不存在则新建"""
+        """
+        重建缓存目录：存在则清空，不存在则新建
+        旧目录只做改名，真正的删除放到后台线程，不阻塞插件加载
+        """
         if self.songs_dir.exists():
-            shutil.rmtree(self.songs_dir)
+            trash = self.songs_dir.with_name(
+                f"{self.songs_dir.name}.trash-{uuid.uuid4().hex}"
+            )
+            try:
+                self.songs_dir.rename(trash)
+            except OSError as e:
+                logger.warning(f"缓存目录改名失败，直接删除: {e}")
+                shutil.rmtree(self.songs_dir, ignore_errors=True)
         self.songs_dir.mkdir(parents=True, exist_ok=True)
+        self._cleanup_task = asyncio.create_task(asyncio.to_thread(self._remove_trash))
         logger.debug(f"缓存目录已重建：{self.songs_dir}")
 
+    def _remove_trash(self) -> None:
+        """删除改名后的旧缓存目录（包括上次未删完的）"""
+        for trash in self.songs_dir.parent.glob(f"{self.songs_dir.name}.trash-*"):
+            shutil.rmtree(trash, ignore_errors=True)
+
     async def download_image(self, url: str, close_ssl: bool = True) -> bytes | None:
         """下载图片"""
         url = url.replace("https://", "http://") if close_ssl else url
@@ -52,14 +112,9 @@ class Downloader:
         song_uuid = uuid.uuid4().hex
         file_path = self.songs_dir / f"{song_uuid}.mp3"
         try:
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    logger.error(f"歌曲下载失败，HTTP 状态码：{response.status}")
+            if not await self._download_ranges(url, file_path):
+                if not await self._download_whole(url, file_path):
                     return None
-                # 流式写入
-                async with aiofiles.open(file_path, "wb") as f:
-                    async for chunk in response.content.iter_chunked(1024):
-                        await f.write(chunk)
 
             logger.debug(f"歌曲下载完成，保存在：{file_path}")
             return file_path
@@ -67,74 +122,285 @@ class Downloader:
         except Exception as e:
             logger.error(f"歌曲下载失败，错误信息：{e}")
             return None
+
+    async def _download_whole(self, url: str, file_path: Path) -> bool:
+        """单连接下载"""
+        async with self.session.get(url) as response:
+            if response.status != 200:
+                logger.error(f"歌曲下载失败，HTTP 状态码：{response.status}")
+                return False
+            size = response.content_length
+            if size is not None and size <= self.MEMORY_LIMIT:
+                buf = bytearray()
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    buf += chunk
+                await asyncio.to_thread(file_path.write_bytes, buf)
+            else:
+                await self._stream_to_file(response, file_path)
+        return True
+
+    async def _download_ranges(self, url: str, file_path: Path) -> bool:
+        """
+        多连接分段下载，各段按偏移直接写入预分配好的文件
+        服务器不支持 Range、文件较小或下载出错时返回 False，由调用方回退到单连接下载
+        """
+        if not hasattr(os, "pwrite"):  # Windows 不支持按偏移写
+            return False
+        try:
+            async with self.session.head(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    return False
+                size = response.content_length
+                accept_ranges = response.headers.get("Accept-Ranges", "").lower()
+                real_url = str(response.url)
+        except Exception as e:
+            logger.debug(f"HEAD 请求失败，改用单连接下载: {e}")
+            return False
+        if accept_ranges != "bytes" or not size or size <= self.RANGE_THRESHOLD:
+            return False
+
+        part_size = -(-size // self.RANGE_PARTS)
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        tasks: list[asyncio.Task] = []
+        try:
+            await asyncio.to_thread(self._preallocate, fd, size)
+            tasks = [
+                asyncio.create_task(
+                    self._download_range(
+                        real_url, fd, start, min(start + part_size, size) - 1
+                    )
+                )
+                for start in range(0, size, part_size)
+            ]
+            await asyncio.gather(*tasks)
+            return True
+        except Exception as e:
+            logger.warning(f"分段下载失败，改用单连接下载: {e}")
+            return False
+        finally:
+            # 任一分段失败时其余分段仍在写入，必须全部结束后才能关闭 fd，
+            # 否则 fd 号被复用后，残留的写入会落到别的文件里
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            os.close(fd)
+
+    async def _download_range(self, url: str, fd: int, start: int, end: int) -> None:
+        """下载 [start, end] 区间并写入文件对应偏移"""
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with self.session.get(url, headers=headers) as response:
+            if response.status != 206:
+                raise RuntimeError(f"分段请求返回 HTTP {response.status}")
+            offset = start
+            buf = bytearray()
+            async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                buf += chunk
+                if len(buf) >= self.RANGE_FLUSH_SIZE:
+                    await self._pwrite(fd, buf, offset)
+                    offset += len(buf)
+                    buf.clear()
+            if buf:
+                await self._pwrite(fd, buf, offset)
+                offset += len(buf)
+        if offset != end + 1:
+            raise RuntimeError(f"分段 {start}-{end} 数据不完整")
+
+    @classmethod
+    async def _pwrite(cls, fd: int, buf: bytearray, offset: int) -> None:
+        """
+        在线程中按偏移写入
+        取消无法中断已经开始的线程写入，被取消时先等它写完再抛出，
+        保证调用方关闭 fd 时不再有写入进行中
+        """
+        write = asyncio.ensure_future(
+            asyncio.to_thread(cls._pwrite_all, fd, buf, offset)
+        )
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            await write
+            raise
+
+    @staticmethod
+    def _writev_all(fd: int, buffers: list[bytes]) -> None:
+        """向量写入多个缓冲区，处理部分写入；不支持 writev 的平台合并后写入"""
+        if not hasattr(os, "writev"):
+            view = memoryview(b"".join(buffers))
+            while view:
+                view = view[os.write(fd, view) :]
+            return
+        views = [memoryview(b) for b in buffers]
+        while views:
+            written = os.writev(fd, views)
+            while views and written >= len(views[0]):
+                written -= len(views.pop(0))
+            if written:
+                views[0] = views[0][written:]
+
+    @staticmethod
+    def _preallocate(fd: int, size: int) -> None:
+        """预分配文件空间，减少分段写入时的碎片"""
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+
+    @staticmethod
+    def _pwrite_all(fd: int, data: bytearray, offset: int) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    async def _stream_to_file(
+        self, response: aiohttp.ClientResponse, file_path: Path
+    ) -> None:
+        """边下边写：事件循环负责读取，单个线程负责顺序写盘"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+        async def take() -> tuple[list[bytes], bool]:
+            """取出当前已积压的块（至少一块），返回 (块列表, 是否结束)"""
+            batch: list[bytes] = []
+            chunk = await queue.get()
+            while chunk is not None:
+                batch.append(chunk)
+                if len(batch) >= self.WRITE_BATCH or queue.empty():
+                    return batch, False
+                chunk = queue.get_nowait()
+            return batch, True
+
+        def next_batch() -> tuple[list[bytes], bool]:
+            return asyncio.run_coroutine_threadsafe(take(), loop).result()
+
+        def write() -> None:
+            done = False
+            try:
+                fd = os.open(file_path, flags, 0o644)
+                try:
+                    while not done:
+                        batch, done = next_batch()
+                        if batch:
+                            # 积压的块通过一次系统调用写入
+                            self._writev_all(fd, batch)
+                finally:
+                    os.close(fd)
+            except BaseException:
+                # 写盘失败也要把队列读空，避免读取端卡在 put 上
+                while not done:
+                    _, done = next_batch()
+                raise
+
+        writer = asyncio.create_task(asyncio.to_thread(write))
+        try:
+            async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                await queue.put(chunk)
+        finally:
+            await queue.put(None)
+            await writer
+
     async def download_youtube(self, url: str) -> Path | None:
-        """从 Youtube 下载音频并转换为 mp3 (带 js_runtime 的独立子进程版)"""
-        import asyncio
-        import sys
-        import json
-        
+        """从 Youtube 下载音频并转换为 mp3（由常驻 yt-dlp 子进程执行）"""
+        if not YTDLP_AVAILABLE:
+            logger.error("未安装 yt-dlp，无法下载 Youtube 音频")
+            return None
+
         song_uuid = uuid.uuid4().hex
         output_template = self.songs_dir / f"{song_uuid}"
         final_path = self.songs_dir / f"{song_uuid}.mp3"
-        
-        # 将复杂的配置参数包装成字典
+
         ydl_opts = {
-            'format': 'ba[abr<=128]/wa/ba/best',
-            'outtmpl': str(output_template) + ".%(ext)s",
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '128',
-            }],
-            'quiet': True,
-            'no_warnings': True,
-            # 找回你最关键的 js 运行时指令！
-            'js_runtimes': {'node': {}},
+            # 源本身就是 mp3 时优先选用，可以免去重新编码
+            "format": "ba[acodec=mp3][abr<=128]/ba[abr<=128]/wa/ba/best",
+            "quiet": True,
+            "no_warnings": True,
+            "js_runtimes": {"node": {}},
         }
-        
+
         cookies_path = self.cfg.data_dir / "cookies.txt"
         if cookies_path.exists():
-            ydl_opts['cookiefile'] = str(cookies_path)
-            
-        # 核心：我们将这一段代码作为一个微型的独立 Python 脚本来运行
-        # 这样它在一个全新的进程里，既不会被 AstrBot 污染，又继承了这套复杂的配置
-        script_code = f"""
-import sys
-import yt_dlp
-import json
-
-ydl_opts = json.loads('''{json.dumps(ydl_opts)}''')
-url = '{url}'
-
-try:
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
-    sys.exit(0)
-except Exception as e:
-    print(f"ERROR: {{e}}", file=sys.stderr)
-    sys.exit(1)
-"""
+            ydl_opts["cookiefile"] = str(cookies_path)
+
+        # 优先只解析直链，由 ffmpeg 边下边转码，省去落盘原始音频再重编码的一轮
+        try:
+            info = await ytdlp.extract_info(url, ydl_opts)
+        except Exception as e:
+            logger.error(f"Youtube 解析失败: {e}")
+            return None
+        if info and info.get("url") and await self._transcode_stream(info, final_path):
+            logger.debug(f"Youtube 下载完成，保存在：{final_path}")
+            return final_path
+
+        # 回退：由 yt-dlp 下载后再用 FFmpegExtractAudio 转码
+        ydl_opts["outtmpl"] = str(output_template) + ".%(ext)s"
+        ydl_opts["postprocessors"] = [
+            {
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "mp3",
+                "preferredquality": "128",
+            }
+        ]
+        try:
+            await ytdlp.extract_info(url, ydl_opts, download=True)
+        except Exception as e:
+            logger.error(f"Youtube 下载失败: {e}")
+            return None
+
+        if not final_path.exists():
+            logger.error(f"Youtube 下载失败，未找到输出文件：{final_path}")
+            return None
+        logger.debug(f"Youtube 下载完成，保存在：{final_path}")
+        return final_path
+
+    async def _transcode_stream(self, info: dict, final_path: Path) -> bool:
+        """ffmpeg 直接读取音频直链并编码为 mp3，网络到磁盘一趟完成"""
+        if not shutil.which("ffmpeg"):
+            return False
+
+        cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y"]
+        if headers := info.get("http_headers"):
+            header_lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+            cmd += ["-headers", header_lines]
+        # ffmpeg 的 HTTP 输入默认不设读超时，连接卡住时会一直挂着（单位：微秒）
+        cmd += ["-rw_timeout", str(self.TRANSCODE_RW_TIMEOUT * 1_000_000)]
+        cmd += ["-i", info["url"], "-vn"]
+        if info.get("acodec") == "mp3":
+            cmd += ["-c:a", "copy"]
+        else:
+            cmd += ["-c:a", "libmp3lame", "-b:a", "128k"]
+        cmd.append(str(final_path))
 
         try:
-            logger.info("启动防污染 Python 子进程执行精确配置的 yt-dlp...")
-            # 异步执行包裹好的 Python 代码
             process = await asyncio.create_subprocess_exec(
-                sys.executable, "-c", script_code,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0 and final_path.exists():
-                logger.debug(f"Youtube 下载完成，保存在：{final_path}")
-                return final_path
-            else:
-                stderr_str = stderr.decode('utf-8', errors='ignore') if stderr else '未知错误'
-                logger.error(f"Youtube 子进程下载失败，退出码 {process.returncode}:\n{stderr_str}")
-                return None
-                
         except Exception as e:
-            logger.error(f"Youtube 下载进程拉起失败: {e}")
-            return None
+            logger.warning(f"ffmpeg 启动失败，回退到 yt-dlp 下载: {e}")
+            return False
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(), timeout=self.TRANSCODE_TIMEOUT
+            )
+        except BaseException as e:
+            # 超时或调用方被取消时都要结束 ffmpeg，否则它会成为孤儿进程继续写半截文件
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            final_path.unlink(missing_ok=True)
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning("ffmpeg 直连转码超时，回退到 yt-dlp 下载")
+                return False
+            raise
 
+        if process.returncode == 0 and final_path.exists():
+            return True
+        err = stderr.decode("utf-8", errors="ignore").strip()[-500:]
+        logger.warning(f"ffmpeg 直连转码失败，回退到 yt-dlp 下载: {err}")
+        final_path.unlink(missing_ok=True)
+        return False
@@ -10,6 +10,13 @@ from astrbot.api import logger
 from ..config import PluginConfig
 from ..model import Platform, Song
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖，未安装时回退到标准库
+    _json_loads = json.loads
+
 
 class BaseMusicPlayer(ABC):
     """
@@ -35,7 +42,12 @@ class BaseMusicPlayer(ABC):
 
     def __init__(self, config: PluginConfig):
         self.cfg = config
-        self.session = aiohttp.ClientSession(proxy=self.cfg.http_proxy)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                use_dns_cache=True, ttl_dns_cache=3600, keepalive_timeout=75
+            ),
+            proxy=self.cfg.http_proxy,
+        )
 
     def __init_subclass__(cls, **kwargs):
         """自动注册子类到 _registry"""
@@ -165,8 +177,8 @@ class BaseMusicPlayer(ABC):
                 return None
 
             try:
-                return json.loads(resp_text)
-            except json.JSONDecodeError:
+                return _json_loads(resp_text)
+            except json.JSONDecodeError:  # orjson.JSONDecodeError 是其子类
                 return resp_text
 
 
@@ -70,6 +70,11 @@ class TXQQMusic(BaseMusicPlayer):
         "kg": ["全民"],
     }
 
+    _PLATFORM_KEYS: tuple[tuple[str, str], ...] = tuple(
+        (k.lower(), ptype) for ptype, keys in PLATFORM_MAP.items() for k in keys
+    )
+    """预先小写化的 (关键词, 平台类型)，按 PLATFORM_MAP 的顺序匹配"""
+
     BASE_URL = "https://music.txqq.pro/"
     HEADERS = {
         "User-Agent": (
@@ -94,10 +99,9 @@ class TXQQMusic(BaseMusicPlayer):
         """
         raw = keyword.lower()
 
-        for ptype, keys in self.PLATFORM_MAP.items():
-            for k in keys:
-                if k.lower() in raw:
-                    return ptype
+        for k, ptype in self._PLATFORM_KEYS:
+            if k in raw:
+                return ptype
         return self.search_platform
 
     async def fetch_songs(
@@ -1,9 +1,11 @@
-import asyncio
 from typing import ClassVar
 
+import aiohttp
+
 from astrbot.api import logger
 from ..config import PluginConfig
 from ..model import Platform, Song
+from ..ytdlp import YTDLP_AVAILABLE, ytdlp
 from .base import BaseMusicPlayer
 
 class YoutubeMusic(BaseMusicPlayer):
@@ -17,72 +19,148 @@ class YoutubeMusic(BaseMusicPlayer):
         keywords=["yt", "油管", "youtube"],
     )
 
+    INNERTUBE_URL = "https://www.youtube.com/youtubei/v1/search?prettyPrint=false"
+    INNERTUBE_CONTEXT = {
+        "client": {"clientName": "WEB", "clientVersion": "2.20250101.00.00"}
+    }
+    INNERTUBE_VIDEO_FILTER = "EgIQAQ=="
+    """ 搜索结果只保留视频 """
+    INNERTUBE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
     def __init__(self, config: PluginConfig):
         super().__init__(config)
 
     async def fetch_songs(
         self, keyword: str, limit: int, extra: str | None = None
     ) -> list:
-        import json
-        import asyncio
-        import sys
+        songs = await self._search_via_innertube(keyword, limit)
+        if songs:
+            return songs
+        # 接口结构变动或请求失败时回退到 yt-dlp
+        return await self._search_via_ytdlp(keyword, limit)
+
+    async def _search_via_innertube(self, keyword: str, limit: int) -> list[Song]:
+        """直接请求 InnerTube 搜索接口，无需经过 yt-dlp 子进程"""
+        payload = {
+            "context": self.INNERTUBE_CONTEXT,
+            "query": keyword,
+            "params": self.INNERTUBE_VIDEO_FILTER,
+        }
+        try:
+            async with self.session.post(
+                self.INNERTUBE_URL,
+                json=payload,
+                headers=self.HEADERS,
+                timeout=self.INNERTUBE_TIMEOUT,
+            ) as resp:
+                result = await self._parse_response(resp)
+        except Exception as e:
+            logger.warning(f"Youtube InnerTube 搜索失败: {e}")
+            return []
+        if not isinstance(result, dict):
+            return []
+
+        songs = []
+        for video in self._iter_video_renderers(result):
+            video_id = video.get("videoId")
+            if not video_id:
+                continue
+            thumbnails = video.get("thumbnail", {}).get("thumbnails") or []
+            songs.append(
+                Song(
+                    id=video_id,
+                    name=self._runs_text(video.get("title")) or "Unknown Title",
+                    artists=self._runs_text(video.get("ownerText"))
+                    or "Unknown Artist",
+                    duration=self._parse_duration(video.get("lengthText")),
+                    audio_url=f"https://www.youtube.com/watch?v={video_id}",
+                    cover_url=thumbnails[-1].get("url") if thumbnails
+                    else f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+                )
+            )
+            if len(songs) >= limit:
+                break
+
+        logger.debug(f"Youtube InnerTube 搜索到 {len(songs)} 首歌曲")
+        return songs
+
+    @classmethod
+    def _iter_video_renderers(cls, node):
+        """在响应中递归查找 videoRenderer，不依赖具体的嵌套层级"""
+        if isinstance(node, dict):
+            if "videoRenderer" in node:
+                yield node["videoRenderer"]
+                return
+            for value in node.values():
+                yield from cls._iter_video_renderers(value)
+        elif isinstance(node, list):
+            for item in node:
+                yield from cls._iter_video_renderers(item)
+
+    @staticmethod
+    def _runs_text(text: dict | None) -> str | None:
+        if not text:
+            return None
+        if "simpleText" in text:
+            return text["simpleText"]
+        return "".join(run.get("text", "") for run in text.get("runs", [])) or None
+
+    @classmethod
+    def _parse_duration(cls, text: dict | None) -> int | None:
+        """把 "1:02:03" 形式的时长转换为毫秒"""
+        value = cls._runs_text(text)
+        if not value:
+            return None
+        seconds = 0
+        try:
+            for part in value.split(":"):
+                seconds = seconds * 60 + int(part)
+        except ValueError:
+            return None
+        return seconds * 1000
+
+    async def _search_via_ytdlp(self, keyword: str, limit: int) -> list[Song]:
+        """通过 yt-dlp 子进程搜索"""
+        if not YTDLP_AVAILABLE:
+            logger.error("未安装 yt-dlp，无法通过 yt-dlp 搜索 Youtube")
+            return []
         search_query = f"ytsearch{limit}:{keyword}"
-        # 核心魔法：拼装独立的进程启动命令
-        # 使用 sys.executable 确保依然使用当前的 python 环境
-        cmd = [
-            sys.executable, "-m", "yt_dlp",
-            "-J",               # 👇 极度关键：--dump-single-json 缩写，yt-dlp会将获取的数据作为单纯的 JSON 字典打印到 stdout 控制台
-            "--flat-playlist",  # 快速提取，不获取流地址
-            "--ignore-errors",
-            "--no-warnings",
-            "--socket-timeout", "10",
-        ]
+        ydl_opts = {
+            "extract_flat": "in_playlist",  # 快速提取，不获取流地址
+            "ignoreerrors": True,
+            "quiet": True,
+            "no_warnings": True,
+            "socket_timeout": 10,
+            # 只要搜索结果的基础信息，关掉各项格式探测
+            "skip_download": True,
+            "check_formats": False,
+            "youtube_include_dash_manifest": False,
+            "youtube_include_hls_manifest": False,
+            "lazy_playlist": True,
+        }
         cookies_path = self.cfg.data_dir / "cookies.txt"
         if cookies_path.exists():
-            cmd.extend(["--cookies", str(cookies_path)])
-            
-        cmd.append(search_query)
-        try:
-            logger.info(f"开启无污染独立子进程搜索: {' '.join(cmd)}")
-            
-            # 使用 asyncio 异步创建纯净的子进程
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                limit=1024 * 1024 * 5 # 赋予子进程 5MB 缓冲区，足量接收 JSON
-            )
-            
-            # 异步非阻塞等待进程执行完成，拿到标准输出
-            stdout, stderr = await process.communicate()
-            if not stdout:
-                logger.error(f"Youtube 子进程搜索抛异常:\n{stderr.decode('utf-8', errors='ignore')}")
-                return []
-            # 因为开启了 -J，yt-dlp所有的过程日志会走 stderr，而纯净的 JSON 结果全在 stdout 里
-            try:
-                # 解析获取到的纯净 JSON，它的结构和之前直接调用代码拿到的字典是一模一样的！
-                raw_json_str = stdout.decode('utf-8', errors='ignore')
-                info = json.loads(raw_json_str)
-            except json.JSONDecodeError as e:
-                logger.error(f"读取子进程 JSON 失败: {e}\n原文前 200 字: {raw_json_str[:200]}")
-                return []
+            ydl_opts["cookiefile"] = str(cookies_path)
 
+        try:
+            logger.debug(f"Youtube 搜索: {search_query}")
+            info = await ytdlp.extract_info(search_query, ydl_opts)
             if not info:
                 return []
 
             songs = []
             entries = info.get('entries', [])
-            
+
             for entry in entries:
                 if not entry:
                     continue
-                    
+
                 video_id = entry.get('id')
                 title = entry.get('title', 'Unknown Title')
                 uploader = entry.get('uploader', 'Unknown Artist')
                 # 构建 Youtube 链接
                 url = entry.get('url') or f"https://www.youtube.com/watch?v={video_id}"
-                
+
                 # 尝试获取封面，flat 模式下可能没有 thumbnail
                 cover = entry.get('thumbnail') or f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
 
@@ -29,34 +29,43 @@ class Playlist:
     async def initialize(self):
         """初始化数据库表"""
         async with self._lock:
-            self._conn = sqlite3.connect(str(self.db_path))
-            self._conn.row_factory = sqlite3.Row
-            cursor = self._conn.cursor()
-
-            # 创建歌单表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS playlist (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    song_id TEXT NOT NULL,
-                    song_name TEXT,
-                    artists TEXT,
-                    duration INTEGER,
-                    cover_url TEXT,
-                    audio_url TEXT,
-                    platform TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, song_id, platform)
-                )
-            """)
+            # 建库建表放到线程里，不阻塞事件循环上其他组件的初始化
+            self._conn = await asyncio.to_thread(self._connect)
+            logger.info("歌单数据库初始化完成")
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        连接数据库并建表
+        连接在工作线程中创建、之后在事件循环线程中使用，访问已由 _lock 串行化
+        """
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
 
-            # 创建索引
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_user_id ON playlist(user_id)
-            """)
+        # 创建歌单表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS playlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                song_id TEXT NOT NULL,
+                song_name TEXT,
+                artists TEXT,
+                duration INTEGER,
+                cover_url TEXT,
+                audio_url TEXT,
+                platform TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, song_id, platform)
+            )
+        """)
 
-            self._conn.commit()
-            logger.info("歌单数据库初始化完成")
+        # 创建索引
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_user_id ON playlist(user_id)
+        """)
+
+        conn.commit()
+        return conn
 
     async def close(self):
         """关闭数据库连接"""
@@ -154,31 +163,91 @@ class Playlist:
                     SELECT song_id, song_name, artists, duration, cover_url, audio_url, platform
                     FROM playlist
                     WHERE user_id = ?
-                    ORDER BY created_at DESC
+                    ORDER BY created_at DESC, id DESC
                     LIMIT ?
                 """,
                     (user_id, limit),
                 )
 
                 rows = cursor.fetchall()
-                result = []
-                for row in rows:
-                    song = Song(
-                        id=row["song_id"],
-                        name=row["song_name"],
-                        artists=row["artists"],
-                        duration=row["duration"],
-                        cover_url=row["cover_url"],
-                        audio_url=row["audio_url"],
-                    )
-                    platform = row["platform"]
-                    result.append((song, platform))
-
-                return result
+                return [(self._row_to_song(row), row["platform"]) for row in rows]
             except Exception as e:
                 logger.error(f"获取用户歌单失败: {e}")
                 return []
 
+    async def get_song_at(self, user_id: str, index: int) -> tuple[Song, str] | None:
+        """
+        按序号获取歌单中的一首歌，顺序与 get_songs 一致
+        :param user_id: 用户ID
+        :param index: 序号，从 1 开始
+        :return: (歌曲, 平台名称)，序号超出范围时返回 None
+        """
+        if index < 1 or index > self.limit:
+            return None
+
+        async with self._lock:
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT song_id, song_name, artists, duration, cover_url, audio_url, platform
+                    FROM playlist
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1 OFFSET ?
+                """,
+                    (user_id, index - 1),
+                )
+
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                return self._row_to_song(row), row["platform"]
+            except Exception as e:
+                logger.error(f"获取歌单歌曲失败: {e}")
+                return None
+
+    async def find_by_name(self, user_id: str, song_name: str) -> tuple[Song, str] | None:
+        """
+        在用户歌单中按歌名精确查找，同名时取最近收藏的一首
+        只做完全匹配：调用方用它来删除歌曲，模糊匹配可能误删名字相近的其他歌曲
+        :param user_id: 用户ID
+        :param song_name: 歌名
+        :return: (歌曲, 平台名称)，找不到时返回 None
+        """
+        async with self._lock:
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT song_id, song_name, artists, duration, cover_url, audio_url, platform
+                    FROM playlist
+                    WHERE user_id = ? AND song_name = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                """,
+                    (user_id, song_name),
+                )
+
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                return self._row_to_song(row), row["platform"]
+            except Exception as e:
+                logger.error(f"按歌名查找歌单歌曲失败: {e}")
+                return None
+
+    @staticmethod
+    def _row_to_song(row: sqlite3.Row) -> Song:
+        return Song(
+            id=row["song_id"],
+            name=row["song_name"],
+            artists=row["artists"],
+            duration=row["duration"],
+            cover_url=row["cover_url"],
+            audio_url=row["audio_url"],
+        )
+
     async def has_song(self, user_id: str, song_id: str, platform: str) -> bool:
         """
         检查歌曲是否在歌单中
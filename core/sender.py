@@ -17,14 +17,28 @@ from .model import Song
 from .platform import BaseMusicPlayer, NetEaseMusic, NetEaseMusicNodeJS
 from .renderer import MusicRenderer
 
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|]')
+
 
 class MusicSender:
+    MAX_CONCURRENT_SENDS = 4
+    """同时进行的选歌列表发送、歌词渲染的数量上限"""
+
     def __init__(
         self, config: PluginConfig, renderer: MusicRenderer, downloader: Downloader
     ):
         self.cfg = config
         self.renderer = renderer
         self.downloader = downloader
+        self._send_sem = asyncio.Semaphore(self.MAX_CONCURRENT_SENDS)
+        self._discord_cls: type | None = None
+        self._telegram_cls: type | None = None
+        self._senders = {
+            "card": self.send_card,
+            "record": self.send_record,
+            "file": self.send_file,
+            "text": self.send_text,
+        }
 
     @staticmethod
     def _format_time(duration_ms):
@@ -64,13 +78,18 @@ class MusicSender:
 
         msg = "\n".join(formatted_songs)
         if isinstance(event, AiocqhttpMessageEvent):
+            cfg = self.cfg
+            timeout_recall, timeout = cfg.timeout_recall, cfg.timeout
             payloads = {"message": [{"type": "text", "data": {"text": msg}}]}
-            message_id = await self.send_msg(event, payloads)
-            if message_id and self.cfg.timeout_recall:
-                await asyncio.sleep(self.cfg.timeout)
+            async with self._send_sem:
+                message_id = await self.send_msg(event, payloads)
+            # 等待撤回期间不占用并发名额
+            if message_id and timeout_recall:
+                await asyncio.sleep(timeout)
                 await event.bot.delete_msg(message_id=message_id)
         else:
-            await event.send(event.plain_result(msg))
+            async with self._send_sem:
+                await event.send(event.plain_result(msg))
 
     async def send_comment(
         self, event: AstrMessageEvent, player: BaseMusicPlayer, song: Song
@@ -98,8 +117,10 @@ class MusicSender:
             logger.error(f"【{song.name}】歌词获取失败")
             return False
         try:
-            image = self.renderer.draw_lyrics(song.lyrics)
-            await event.send(MessageChain(chain=[Image.fromBytes(image)]))
+            async with self._send_sem:
+                # 渲染是纯 CPU 操作，放到线程中执行，避免卡住事件循环
+                image = await asyncio.to_thread(self.renderer.draw_lyrics, song.lyrics)
+                await event.send(MessageChain(chain=[Image.fromBytes(image)]))
             return True
         except Exception as e:
             logger.error(f"【{song.name}】歌词渲染/发送失败: {e}")
@@ -190,7 +211,7 @@ class MusicSender:
         try:
             # 清洗文件名
             raw_filename = f"{song.name} - {song.artists}{file_path.suffix}"
-            safe_filename = re.sub(r'[\\/:*?"<>|]', '_', raw_filename)
+            safe_filename = _UNSAFE_FILENAME_RE.sub("_", raw_filename)
             
             # 针对 OneBot (NapCat) 协议，手动构造消息以绕过 Core 的潜在处理
             if isinstance(event, AiocqhttpMessageEvent):
@@ -233,20 +254,8 @@ class MusicSender:
             logger.error(f"发送歌曲信息失败: {e}")
             return False
 
-    def _get_sender(self, mode: str):
-        return {
-            "card": self.send_card,
-            "record": self.send_record,
-            "file": self.send_file,
-            "text": self.send_text,
-        }.get(mode)
-
-    def _is_mode_supported(self, mode: str, event, player) -> bool:
-        if mode == "card":
-            return isinstance(event, AiocqhttpMessageEvent) and isinstance(
-                player, NetEaseMusic | NetEaseMusicNodeJS
-            )
-        # 延迟导入，防止初始化卡顿
+    def _lazy_load_platform_classes(self) -> None:
+        """延迟导入，防止初始化卡顿；只在首次用到时导入一次"""
         from astrbot.core.platform.sources.discord.discord_platform_event import (
             DiscordViewComponent,
         )
@@ -254,21 +263,33 @@ class MusicSender:
             TelegramPlatformEvent,
         )
 
+        self._discord_cls = DiscordViewComponent
+        self._telegram_cls = TelegramPlatformEvent
+
+    def _is_mode_supported(self, mode: str, event, player) -> bool:
+        if mode == "card":
+            return isinstance(event, AiocqhttpMessageEvent) and isinstance(
+                player, NetEaseMusic | NetEaseMusicNodeJS
+            )
+
+        if mode == "text":
+            return True
+
+        if self._discord_cls is None:
+            self._lazy_load_platform_classes()
+
         if mode == "record":
             return isinstance(
                 event,
-                AiocqhttpMessageEvent | TelegramPlatformEvent,
+                (AiocqhttpMessageEvent, self._telegram_cls),
             )
 
         if mode == "file":
             return isinstance(
                 event,
-                AiocqhttpMessageEvent | TelegramPlatformEvent | DiscordViewComponent,
+                (AiocqhttpMessageEvent, self._telegram_cls, self._discord_cls),
             )
 
-        if mode == "text":
-            return True
-
         return False
 
     async def send_song(self, event: AstrMessageEvent, player: BaseMusicPlayer, song: Song):
@@ -278,13 +299,17 @@ class MusicSender:
         )
 
         sent = False
+        cfg = self.cfg
+        modes = cfg.real_send_modes
+        senders = self._senders
+        is_supported = self._is_mode_supported
 
-        for mode in self.cfg.real_send_modes:
-            if not self._is_mode_supported(mode, event, player):
+        for mode in modes:
+            if not is_supported(mode, event, player):
                 logger.debug(f"{mode} 不支持，跳过")
                 continue
 
-            sender = self._get_sender(mode)
+            sender = senders.get(mode)
             if not sender:
                 continue
 
@@ -304,9 +329,16 @@ class MusicSender:
         if not sent:
             await event.send(event.plain_result("歌曲发送失败"))
 
-        # 附加内容不影响主流程
-        if sent and self.cfg.enable_comments:
-            await self.send_comment(event, player, song)
+        # 附加内容不影响主流程，评论和歌词互不依赖，并发获取
+        extras = []
+        if sent and cfg.enable_comments:
+            extras.append(self.send_comment(event, player, song))
+
+        if sent and cfg.enable_lyrics:
+            extras.append(self.send_lyrics(event, player, song))
 
-        if sent and self.cfg.enable_lyrics:
-            await self.send_lyrics(event, player, song)
+        if extras:
+            results = await asyncio.gather(*extras, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"【{song.name}】附加内容发送失败: {result!r}")
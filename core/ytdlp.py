@@ -0,0 +1,139 @@
+import asyncio
+import importlib.util
+import itertools
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+from astrbot.api import logger
+
+
+YTDLP_AVAILABLE = importlib.util.find_spec("yt_dlp") is not None
+"""是否安装了 yt-dlp（只探测，不在主进程中导入）"""
+
+
+class YtDlpError(Exception):
+    """yt-dlp 子进程返回的错误"""
+
+
+class YtDlpWorker:
+    """
+    yt-dlp 常驻子进程客户端
+    yt-dlp 依然运行在独立进程里，不会污染 AstrBot，
+    但进程只启动一次，并在其中复用 YoutubeDL 实例
+    """
+
+    SCRIPT = Path(__file__).with_name("ytdlp_worker.py")
+
+    STREAM_LIMIT = 16 * 1024 * 1024
+    """单行响应上限，搜索结果的 JSON 可能较大"""
+
+    REQUEST_TIMEOUT = 300
+    """单次请求的最长等待时间（秒），包含下载耗时"""
+
+    def __init__(self):
+        self._process: asyncio.subprocess.Process | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader: asyncio.Task | None = None
+        self._ids = itertools.count()
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """预先拉起子进程，把 yt-dlp 的导入耗时挪到插件加载阶段"""
+        if YTDLP_AVAILABLE:
+            await self._ensure_started()
+
+    async def _ensure_started(self) -> asyncio.subprocess.Process:
+        if not YTDLP_AVAILABLE:
+            raise YtDlpError("未安装 yt-dlp，请先执行 pip install yt-dlp")
+        async with self._lock:
+            if self._process and self._process.returncode is None:
+                return self._process
+            logger.info("启动 yt-dlp 常驻子进程")
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(self.SCRIPT),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=self.STREAM_LIMIT,
+            )
+            # 每个子进程对应一份等待表，重启后旧进程的收尾不会波及新请求
+            self._pending = {}
+            self._reader = asyncio.create_task(
+                self._read_loop(self._process, self._pending)
+            )
+            return self._process
+
+    async def _read_loop(
+        self, process: asyncio.subprocess.Process, pending: dict[int, asyncio.Future]
+    ) -> None:
+        assert process.stdout
+        try:
+            while line := await process.stdout.readline():
+                resp = json.loads(line)
+                fut = pending.pop(resp["id"], None)
+                if not fut or fut.done():
+                    continue
+                if resp["ok"]:
+                    fut.set_result(resp.get("result"))
+                else:
+                    fut.set_exception(YtDlpError(resp.get("error")))
+        except Exception as e:
+            logger.error(f"读取 yt-dlp 子进程输出失败: {e}")
+        finally:
+            # 读取端已退出，这个进程的响应再也无人处理，结束它并让下次请求重新拉起
+            if self._process is process:
+                self._process = None
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(YtDlpError("yt-dlp 子进程已退出"))
+            pending.clear()
+
+    async def extract_info(
+        self, url: str, opts: dict[str, Any], download: bool = False
+    ) -> dict | None:
+        """
+        在子进程中执行 YoutubeDL.extract_info
+        :param url: 视频链接或搜索串（如 ytsearch5:xxx）
+        :param opts: YoutubeDL 参数
+        :param download: 是否下载，下载时不回传 info
+        """
+        process = await self._ensure_started()
+        assert process.stdin
+        req_id = next(self._ids)
+        pending = self._pending
+        fut = asyncio.get_running_loop().create_future()
+        pending[req_id] = fut
+        req = {"id": req_id, "url": url, "opts": opts, "download": download}
+        try:
+            process.stdin.write(json.dumps(req).encode() + b"\n")
+            await process.stdin.drain()
+            return await asyncio.wait_for(fut, timeout=self.REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise YtDlpError(f"yt-dlp 请求超时（{self.REQUEST_TIMEOUT}s）")
+        finally:
+            pending.pop(req_id, None)
+
+    async def close(self) -> None:
+        """关闭子进程"""
+        process, self._process = self._process, None
+        if not process or process.returncode is not None:
+            return
+        if process.stdin:
+            process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+ytdlp = YtDlpWorker()
+"""Downloader 与 YoutubeMusic 共用的 yt-dlp 子进程"""
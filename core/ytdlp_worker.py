@@ -0,0 +1,107 @@
+"""
+yt-dlp 常驻子进程
+
+由 core/ytdlp.py 以独立进程启动，不会被 AstrBot 导入。
+stdin 每行一个 JSON 请求，stdout 每行一个 JSON 响应：
+- 请求: {"id": int, "url": str, "opts": dict, "download": bool}
+- 响应: {"id": int, "ok": bool, "result": dict | None, "error": str}
+
+同一组参数复用同一个 YoutubeDL 实例，省去每次调用的进程启动、
+yt-dlp 导入、extractor 初始化和 cookies 解析开销。
+"""
+
+import copy
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+
+def main():
+    # 以脚本方式运行时 sys.path[0] 是 core/，其中的 platform 包会遮蔽标准库
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != here]
+
+    import yt_dlp
+
+    out = sys.stdout
+    # yt-dlp 自身的输出一律走 stderr，stdout 只留给协议
+    sys.stdout = sys.stderr
+    out_lock = threading.Lock()
+
+    # 参数 -> (cookies 修改时间, 实例, 实例锁)
+    cache: dict[str, tuple[int | None, yt_dlp.YoutubeDL, threading.Lock]] = {}
+    cache_lock = threading.Lock()
+
+    def cookies_mtime(opts: dict) -> int | None:
+        cookiefile = opts.get("cookiefile")
+        if cookiefile and os.path.exists(cookiefile):
+            return os.stat(cookiefile).st_mtime_ns
+        return None
+
+    def create(opts: dict) -> yt_dlp.YoutubeDL:
+        # YoutubeDL 会原地修改传入的参数，这里给它一份副本
+        return yt_dlp.YoutubeDL(copy.deepcopy(opts))
+
+    @contextmanager
+    def acquire(opts: dict):
+        key = json.dumps(
+            {k: v for k, v in opts.items() if k != "outtmpl"}, sort_keys=True
+        )
+        mtime = cookies_mtime(opts)
+        with cache_lock:
+            entry = cache.get(key)
+            # cookies 文件被重新上传后，旧实例里的 cookiejar 已过期
+            if entry is None or entry[0] != mtime:
+                entry = (mtime, create(opts), threading.Lock())
+                cache[key] = entry
+        loaded_mtime, ydl, lock = entry
+        if lock.acquire(blocking=False):
+            try:
+                yield ydl
+            finally:
+                try:
+                    # 与 with YoutubeDL 退出时一样回写 YouTube 轮换后的 cookies；
+                    # 期间用户重新上传过 cookies 时不覆盖新文件
+                    if cookies_mtime(opts) == loaded_mtime:
+                        ydl.save_cookies()
+                        with cache_lock:
+                            # 记下回写后的修改时间，避免自己的回写触发实例重建
+                            if cache.get(key) is entry:
+                                cache[key] = (cookies_mtime(opts), ydl, lock)
+                except Exception as e:
+                    print(f"回写 cookies 失败: {e}", file=sys.stderr)
+                finally:
+                    lock.release()
+        else:
+            # 缓存实例正忙，临时新建一个，避免并发请求互相等待；退出时关闭并回写 cookies
+            with create(opts) as tmp:
+                yield tmp
+
+    def handle(req: dict):
+        opts = req["opts"]
+        download = req.get("download", False)
+        try:
+            with acquire(opts) as ydl:
+                if "outtmpl" in opts:
+                    ydl.params["outtmpl"]["default"] = opts["outtmpl"]
+                info = ydl.extract_info(req["url"], download=download)
+                result = None if download else ydl.sanitize_info(info)
+            resp = {"id": req["id"], "ok": True, "result": result}
+        except BaseException as e:
+            resp = {"id": req["id"], "ok": False, "error": str(e)}
+        line = json.dumps(resp)
+        with out_lock:
+            out.write(line + "\n")
+            out.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        threading.Thread(target=handle, args=(req,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 import asyncio
+import dataclasses
+import re
+import time
 import traceback
+import weakref
+from collections import OrderedDict
+
+import aiohttp
 
 from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent, filter
@@ -12,66 +19,173 @@ from astrbot.core.utils.session_waiter import (
 
 from .core.config import PluginConfig
 from .core.downloader import Downloader
+from .core.model import Song
 from .core.platform import BaseMusicPlayer
 from .core.playlist import Playlist
 from .core.renderer import MusicRenderer
 from .core.sender import MusicSender
 
+_ARG_RE = re.compile(r"^(.*?)(?:\s+(\d+))?\s*$", re.DOTALL)
+"""点歌参数：歌名 + 可选的末尾序号"""
+
+
+def _command_regex() -> str:
+    """
+    点歌命令的预过滤正则，交给框架在分发阶段匹配：
+    命令词（首个空格前）包含「点歌」或任一平台触发词，且命令后带有参数
+    """
+    keywords = {"点歌"}
+    for cls in BaseMusicPlayer.get_all_subclass():
+        keywords.update(cls.platform.keywords)
+    alternatives = "|".join(map(re.escape, sorted(keywords, key=len, reverse=True)))
+    return rf"(?i)^\S*?(?:{alternatives})\S* +\S"
+
 
 class MusicPlugin(Star):
+    SEARCH_CACHE_TTL = 300
+    """搜索结果缓存时长（秒）"""
+
+    SEARCH_CACHE_SIZE = 512
+    """搜索结果缓存条数上限"""
+
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.cfg = PluginConfig(config, context)
+        # 已实例化的播放器，首次用到某个平台时才创建
         self.players: list[BaseMusicPlayer] = []
         self.keywords: list[str] = []
-
+        self._player_classes: dict[type[BaseMusicPlayer], BaseMusicPlayer | None] = {}
+        # 预先小写化的索引，避免每条消息都重复 lower()
+        self._by_name: dict[str, type[BaseMusicPlayer]] = {}
+        self._kw_players: dict[str, type[BaseMusicPlayer]] = {}
+        self._kw_pattern: re.Pattern[str] = re.compile(r"(?!)")
+        # (平台, 关键词, 数量, 额外参数) -> (写入时间, 搜索结果)
+        self._search_cache: OrderedDict[tuple, tuple[float, list[Song]]] = OrderedDict()
+        # 正在进行中的搜索，相同请求并发到达时共用一次远程调用
+        self._inflight: dict[tuple, asyncio.Task[list[Song]]] = {}
+        # 会话 -> 发送锁，同一会话的发歌串行，不同会话互不影响；无人持有时自动回收
+        self._send_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
 
     async def initialize(self):
         """插件加载时会调用"""
         self._register_player()
         self.downloader = Downloader(self.cfg)
-        await self.downloader.initialize()
         self.renderer = MusicRenderer(self.cfg)
         self.sender = MusicSender(self.cfg, self.renderer, self.downloader)
 
         # 歌单管理器
         self.playlist = Playlist(self.cfg)
-        await self.playlist.initialize()
+
+        # 两者的初始化互不依赖，并发进行
+        await asyncio.gather(self.downloader.initialize(), self.playlist.initialize())
+
+        # 通用 HTTP 会话（不走代理，用于下载用户上传的文件）
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+        )
 
     async def terminate(self):
         """当插件被卸载/停用时会调用"""
-        await self.downloader.close()
-        for parser in self.players:
-            await parser.close()
-        await self.playlist.close()
+        await asyncio.gather(
+            self.downloader.close(),
+            self.playlist.close(),
+            self.session.close(),
+            *(player.close() for player in self.players),
+            return_exceptions=True,
+        )
 
     def get_player(
         self, name: str | None = None, word: str | None = None, default: bool = False
     ) -> BaseMusicPlayer | None:
         if default:
             word = self.cfg.default_player_name
-        for player in self.players:
-            if name:
-                name_ = name.strip().lower()
-                p = player.platform
-                if p.display_name.lower() == name_ or p.name.lower() == name_:
-                    return player
-            elif word:
-                word_ = word.strip().lower()
-                for keyword in player.platform.keywords:
-                    if keyword.lower() in word_:
-                        return player
+        cls = None
+        if name:
+            cls = self._by_name.get(name.strip().lower())
+        elif word:
+            if m := self._kw_pattern.search(word.strip().lower()):
+                cls = self._kw_players[m.group()]
+        if cls is None:
+            return None
+        player = self._player_classes[cls]
+        if player is None:
+            player = self._player_classes[cls] = cls(self.cfg)
+            self.players.append(player)
+        return player
+
+    async def _fetch_songs(
+        self,
+        player: BaseMusicPlayer,
+        keyword: str,
+        limit: int,
+        extra: str | None = None,
+    ) -> list[Song]:
+        """
+        带短期缓存的搜索，同一关键词短时间内重复搜索直接返回缓存
+        下游会原地补全歌曲（音频直链、歌词等），因此每次都返回副本，
+        缓存里只保留搜索得到的原始结果
+        """
+        key = (player.platform.name, keyword, limit, extra)
+        hit = self._search_cache.get(key)
+        if hit and time.monotonic() - hit[0] < self.SEARCH_CACHE_TTL:
+            self._search_cache.move_to_end(key)
+            return [dataclasses.replace(song) for song in hit[1]]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(
+                self._search_and_cache(key, player, keyword, limit, extra)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：某个等待者被取消时不影响共用同一次搜索的其他人
+        songs = await asyncio.shield(task)
+        return [dataclasses.replace(song) for song in songs]
+
+    async def _search_and_cache(
+        self,
+        key: tuple,
+        player: BaseMusicPlayer,
+        keyword: str,
+        limit: int,
+        extra: str | None,
+    ) -> list[Song]:
+        songs = await player.fetch_songs(keyword=keyword, limit=limit, extra=extra)
+        if songs:
+            self._search_cache[key] = (time.monotonic(), songs)
+            self._search_cache.move_to_end(key)
+            if len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        return songs
+
+    def _send_lock(self, event: AstrMessageEvent) -> asyncio.Lock:
+        """获取当前会话的发送锁"""
+        session = event.unified_msg_origin
+        lock = self._send_locks.get(session)
+        if lock is None:
+            lock = self._send_locks[session] = asyncio.Lock()
+        return lock
 
     def _register_player(self):
         """注册音乐播放器"""
         all_subclass = BaseMusicPlayer.get_all_subclass()
         for _cls in all_subclass:
-            player = _cls(self.cfg)
-            self.players.append(player)
-            self.keywords.extend(player.platform.keywords)
+            # 只登记类，实例在 get_player 首次命中时再创建
+            self._player_classes[_cls] = None
+            p = _cls.platform
+            self.keywords.extend(p.keywords)
+            self._by_name.setdefault(p.name.lower(), _cls)
+            self._by_name.setdefault(p.display_name.lower(), _cls)
+            for kw in p.keywords:
+                self._kw_players.setdefault(kw.lower(), _cls)
+        # 所有关键词编译成一个正则，一次扫描完成匹配；同一位置长关键词优先
+        if self._kw_players:
+            keywords = sorted(self._kw_players, key=len, reverse=True)
+            self._kw_pattern = re.compile("|".join(map(re.escape, keywords)))
         logger.debug(f"已注册触发词：{self.keywords}")
 
-    @filter.event_message_type(filter.EventMessageType.ALL)
+    @filter.regex(_command_regex())
     async def on_search_song(self, event: AstrMessageEvent):
         """监听点歌命令： 点歌、网易点歌、网易nj、QQ点歌、酷狗点歌、酷我点歌、百度点歌、咪咕点歌、荔枝点歌、蜻蜓点歌、喜马拉雅、5sing原创、5sing翻唱、全民K歌"""
         # 解析参数
@@ -80,34 +194,38 @@ class MusicPlugin(Star):
         cmd, _, arg = event.message_str.partition(" ")
         if not arg:
             return
-        player = self.get_player(word=cmd)
         if "点歌" == cmd:
             player = self.get_player(default=True)
+        else:
+            player = self.get_player(word=cmd)
         if not player:
             return
-        args = arg.split()
-        index: int = int(args[-1]) if args[-1].isdigit() else 0
-        song_name = arg.removesuffix(str(index))
+        m = _ARG_RE.match(arg)
+        song_name = m.group(1).strip()
+        index: int = int(m.group(2)) if m.group(2) else 0
         if not song_name:
             yield event.plain_result("未指定歌名")
             return
         # 搜索歌曲
         logger.debug(f"正在通过{player.platform.display_name}搜索歌曲：{song_name}")
-        songs = await player.fetch_songs(
-            keyword=song_name, limit=self.cfg.real_song_limit, extra=cmd
+        songs = await self._fetch_songs(
+            player, song_name, limit=self.cfg.real_song_limit, extra=cmd
         )
         if not songs:
             yield event.plain_result(f"搜索【{song_name}】无结果")
             return
 
+        len_songs = len(songs)
+
         # 单曲模式
-        if len(songs) == 1:
+        if len_songs == 1:
             index = 1
 
         # 输入了序号，直接发送歌曲
-        if index and 0 <= index <= len(songs):
-            selected_song = songs[int(index) - 1]
-            await self.sender.send_song(event, player, selected_song)
+        if index and 0 <= index <= len_songs:
+            selected_song = songs[index - 1]
+            async with self._send_lock(event):
+                await self.sender.send_song(event, player, selected_song)
 
         # 未提输入序号，等待用户选择歌曲
         else:
@@ -121,18 +239,19 @@ class MusicPlugin(Star):
                 controller: SessionController, event: AstrMessageEvent
             ):
                 arg = event.message_str.partition(" ")[0]
-                arg_ = arg.strip().lower()
-                for kw in self.keywords:
-                    if kw in arg_:
-                        controller.stop()
-                        return
-                if not arg.isdigit():
+                if self._kw_pattern.search(arg.strip().lower()):
+                    controller.stop()
                     return
-                if int(arg) < 1 or int(arg) > len(songs):
+                # 只接受纯数字，"-1"、"+2" 之类的回复视为无关消息继续等待
+                if not arg.isdecimal():
+                    return
+                n = int(arg)
+                if not 1 <= n <= len_songs:
                     controller.stop()
                     return
-                selected_song = songs[int(arg) - 1]
-                await self.sender.send_song(event, player, selected_song)
+                selected_song = songs[n - 1]
+                async with self._send_lock(event):
+                    await self.sender.send_song(event, player, selected_song)
                 controller.stop()
 
             try:
@@ -152,7 +271,7 @@ class MusicPlugin(Star):
         if not player:
             yield event.plain_result("无可用播放器")
             return
-        songs = await player.fetch_songs(keyword=song_name, limit=1)
+        songs = await self._fetch_songs(player, song_name, limit=1)
         if not songs:
             yield event.plain_result("没找到相关歌曲")
             return
@@ -168,10 +287,11 @@ class MusicPlugin(Star):
         player = self.get_player(default=True)
         if not player:
             return "无可用播放器"
-        songs = await player.fetch_songs(keyword=song_name, limit=1)
+        songs = await self._fetch_songs(player, song_name, limit=1)
         if not songs:
             return "没找到相关歌曲"
-        await self.sender.send_song(event, player, songs[0])
+        async with self._send_lock(event):
+            await self.sender.send_song(event, player, songs[0])
 
     @filter.command("歌单收藏")
     async def collect_song(self, event: AstrMessageEvent, song_name: str):
@@ -183,7 +303,7 @@ class MusicPlugin(Star):
             return
 
         # 搜索歌曲
-        songs = await player.fetch_songs(keyword=song_name, limit=1)
+        songs = await self._fetch_songs(player, song_name, limit=1)
         if not songs:
             yield event.plain_result(f"搜索【{song_name}】无结果")
             return
@@ -202,19 +322,23 @@ class MusicPlugin(Star):
     async def uncollect_song(self, event: AstrMessageEvent, song_name: str):
         """歌单取藏 <歌名>"""
         user_id = event.get_sender_id()
-        player = self.get_player(default=True)
-        if not player:
-            yield event.plain_result("无可用播放器")
-            return
 
-        # 搜索歌曲
-        songs = await player.fetch_songs(keyword=song_name, limit=1)
-        if not songs:
-            yield event.plain_result(f"搜索【{song_name}】无结果")
-            return
+        # 优先在本地歌单中查找，找不到再远程搜索
+        if hit := await self.playlist.find_by_name(user_id, song_name):
+            song, platform = hit
+        else:
+            player = self.get_player(default=True)
+            if not player:
+                yield event.plain_result("无可用播放器")
+                return
 
-        song = songs[0]
-        platform = player.platform.name
+            songs = await self._fetch_songs(player, song_name, limit=1)
+            if not songs:
+                yield event.plain_result(f"搜索【{song_name}】无结果")
+                return
+
+            song = songs[0]
+            platform = player.platform.name
 
         # 从歌单移除
         success = await self.playlist.remove_song(user_id, song.id, platform)
@@ -241,11 +365,13 @@ class MusicPlugin(Star):
             return
 
         # 格式化歌单
-        playlist_text = f"【{user_name}的歌单】\n"
-        for i, (song, platform) in enumerate(songs_with_platform, 1):
-            playlist_text += f"{i}. {song.name} - {song.artists}\n"
+        lines = [f"【{user_name}的歌单】"]
+        lines.extend(
+            f"{i}. {song.name} - {song.artists}"
+            for i, (song, _) in enumerate(songs_with_platform, 1)
+        )
 
-        yield event.plain_result(playlist_text.strip())
+        yield event.plain_result("\n".join(lines).strip())
 
     @filter.command("歌单点歌")
     async def play_from_playlist(self, event: AstrMessageEvent, index: str):
@@ -262,20 +388,18 @@ class MusicPlugin(Star):
             yield event.plain_result("序号必须大于0")
             return
 
-        # 获取歌单
-        songs_with_platform = await self.playlist.get_songs(user_id)
-        if not songs_with_platform:
-            yield event.plain_result("你的歌单是空的")
-            return
-
-        if idx > len(songs_with_platform):
-            yield event.plain_result(
-                f"序号超出范围，你的歌单只有{len(songs_with_platform)}首歌"
-            )
+        # 只查询指定序号的那一首
+        hit = await self.playlist.get_song_at(user_id, idx)
+        if not hit:
+            count = min(await self.playlist.get_count(user_id), self.playlist.limit)
+            if not count:
+                yield event.plain_result("你的歌单是空的")
+            else:
+                yield event.plain_result(f"序号超出范围，你的歌单只有{count}首歌")
             return
 
         # 获取指定的歌曲和平台
-        song, platform_name = songs_with_platform[idx - 1]
+        song, platform_name = hit
 
         # 找到对应的播放器
         player = self.get_player(name=platform_name)
@@ -288,7 +412,8 @@ class MusicPlugin(Star):
             return
 
         # 发送歌曲
-        await self.sender.send_song(event, player, song)
+        async with self._send_lock(event):
+            await self.sender.send_song(event, player, song)
 
     @filter.command("上传cookies")
     async def upload_cookies(self, event: AstrMessageEvent):
@@ -322,8 +447,9 @@ class MusicPlugin(Star):
             if not file_url and len(event.message_str) > 50 and ".youtube.com" in event.message_str:
                  try:
                     cookies_path = self.cfg.data_dir / "cookies.txt"
-                    with open(cookies_path, "w", encoding="utf-8") as f:
-                        f.write(event.message_str)
+                    await asyncio.to_thread(
+                        cookies_path.write_text, event.message_str, encoding="utf-8"
+                    )
                     await event.send(event.plain_result("Cookies 内容已保存！"))
                     controller.stop()
                     return
@@ -333,19 +459,23 @@ class MusicPlugin(Star):
                     return
 
             # 3. 如果是文件 URL，下载并保存
-            import aiohttp
             if file_url:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(file_url) as resp:
-                            if resp.status == 200:
-                                content = await resp.text()
-                                cookies_path = self.cfg.data_dir / "cookies.txt"
-                                with open(cookies_path, "w", encoding="utf-8") as f:
-                                    f.write(content)
-                                await event.send(event.plain_result("Cookies 文件已接收并保存！"))
-                            else:
-                                await event.send(event.plain_result("下载文件失败"))
+                    async with self.session.get(file_url) as resp:
+                        if resp.status == 200:
+                            # 按原始字节分块落盘，写完再替换，避免留下半个 cookies 文件
+                            cookies_path = self.cfg.data_dir / "cookies.txt"
+                            part_path = cookies_path.with_suffix(".txt.part")
+                            f = await asyncio.to_thread(part_path.open, "wb")
+                            try:
+                                async for chunk in resp.content.iter_chunked(65536):
+                                    await asyncio.to_thread(f.write, chunk)
+                            finally:
+                                await asyncio.to_thread(f.close)
+                            await asyncio.to_thread(part_path.replace, cookies_path)
+                            await event.send(event.plain_result("Cookies 文件已接收并保存！"))
+                        else:
+                            await event.send(event.plain_result("下载文件失败"))
                     controller.stop()
                     return
                 except Exception as e: